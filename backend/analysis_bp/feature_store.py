@@ -0,0 +1,102 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+
+FEATURE_STORE_FOLDER = os.environ.get('FEATURE_STORE_FOLDER', 'feature_store')
+# 2: emotion rows are time-aligned (NaN scores / -1 dominant for frames without a face).
+FEATURE_STORE_VERSION = 2
+
+# Per-stage feature arrays are flattened into a single npz as "<stage>.<name>".
+# A stage that failed is stored as "<stage>.error"; a stage with no result has no keys.
+STAGES = ('emotion', 'posture', 'speech', 'prosody', 'openpose')
+
+if not os.path.exists(FEATURE_STORE_FOLDER):
+    os.makedirs(FEATURE_STORE_FOLDER)
+
+
+def hash_video(video_path, chunk_size=1 << 20):
+
+    digest = hashlib.sha256()
+    with open(video_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _feature_path(video_hash):
+    return os.path.join(FEATURE_STORE_FOLDER, f"{video_hash}.npz")
+
+
+def _is_valid_hash(video_hash):
+    return len(video_hash) == 64 and all(c in '0123456789abcdef' for c in video_hash)
+
+
+def has_features(video_hash):
+    return _is_valid_hash(video_hash) and os.path.exists(_feature_path(video_hash))
+
+
+def save_features(video_hash, stage_features):
+
+    arrays = {'__version__': np.array(FEATURE_STORE_VERSION, dtype=np.int16)}
+    for stage in STAGES:
+        features = stage_features.get(stage)
+        if features is None:
+            continue
+        if 'error' in features:
+            arrays[f"{stage}.error"] = np.array(str(features['error']))
+            continue
+        for name, value in features.items():
+            arrays[f"{stage}.{name}"] = np.asarray(value)
+
+    # Write to a temp file first so a concurrent re-score never sees a partial npz.
+    # mkstemp gives each writer (thread or process) its own temp file.
+    path = _feature_path(video_hash)
+    fd, tmp_path = tempfile.mkstemp(dir=FEATURE_STORE_FOLDER, prefix=f"{video_hash}.", suffix='.tmp')
+    try:
+        # Compressed: pose keypoints are mostly empty slots and low-confidence zeros, so they shrink several-fold.
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+        print(f"Stored features for {video_hash} at {path}")
+    except OSError as e:
+        print(f"Error storing features for {video_hash}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def load_features(video_hash):
+
+    if not has_features(video_hash):
+        return None
+
+    stage_features = {stage: None for stage in STAGES}
+    with np.load(_feature_path(video_hash), allow_pickle=False) as data:
+        version = int(data['__version__']) if '__version__' in data.files else 1
+        if version > FEATURE_STORE_VERSION:
+            print(f"Stored features for {video_hash} are version {version}, newer than supported {FEATURE_STORE_VERSION}.")
+            return None
+        for key in data.files:
+            if key == '__version__':
+                continue
+            stage, name = key.split('.', 1)
+            if stage not in stage_features:
+                continue
+            if stage_features[stage] is None:
+                stage_features[stage] = {}
+            value = data[key]
+            stage_features[stage][name] = value.item() if value.ndim == 0 else value
+    return _upgrade_features(stage_features, version)
+
+
+def _upgrade_features(stage_features, version):
+
+    # Version 1 kept only the frames where a face was found, so the rows still give
+    # correct averages but can't be placed on the video timeline.
+    emotion = stage_features.get('emotion')
+    if version < 2 and emotion is not None and 'error' not in emotion:
+        emotion['time_aligned'] = False
+    return stage_features
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import time
+import subprocess
+import numpy as np
+from analysis_bp.timeline import grow_rows
+
+
+# Pose backend config. OPENPOSE_BIN_PATH can point at tools/openpose_stub.py for local runs without OpenPose.
+POSE_BACKEND = os.environ.get('POSE_BACKEND', 'openpose')
+OPENPOSE_BIN_PATH = os.environ.get('OPENPOSE_BIN_PATH', "C:/path/to/openpose/bin/OpenPoseDemo.exe")
+POSE_MAX_PEOPLE = int(os.environ.get('POSE_MAX_PEOPLE', 2))
+POSE_POLL_SECONDS = 0.05
+# Wall-clock limit for one OpenPose run; a hung or runaway process is killed after this.
+POSE_TIMEOUT_SECONDS = int(os.environ.get('POSE_TIMEOUT_SECONDS', 60 * 60))
+
+# BODY_25 layout written by OpenPose's --write_json.
+BODY_25_KEYPOINTS = 25
+NOSE, NECK, R_SHOULDER, R_WRIST, L_SHOULDER, L_WRIST, MID_HIP = 0, 1, 2, 4, 5, 7, 8
+
+SPEAKER_JUMP_SHOULDER_WIDTHS = 0.5
+
+_KEYPOINT_FILE = re.compile(r"_(\d+)_keypoints\.json$")
+
+
+def _order_people(people, previous_neck):
+
+    # Slot 0 is the speaker: whoever's neck is nearest the speaker's neck in the previous
+    # frame, or the most confident person when there is nothing to track from yet.
+    people.sort(key=lambda person: person[:, 2].sum(), reverse=True)
+    if previous_neck is not None:
+        tracked = [i for i, person in enumerate(people) if len(person) > NECK and person[NECK, 2] > 0]
+        if tracked:
+            nearest = min(tracked, key=lambda i: np.linalg.norm(people[i][NECK, :2] - previous_neck))
+            people.insert(0, people.pop(nearest))
+    return people
+
+
+def _ingest_keypoint_file(filepath, keypoints, frame_idx, previous_neck):
+
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+
+    people = [
+        np.asarray(person['pose_keypoints_2d'], dtype=np.float32).reshape(-1, 3)[:BODY_25_KEYPOINTS]
+        for person in data.get('people', [])
+        if person.get('pose_keypoints_2d')
+    ]
+    people = _order_people(people, previous_neck)
+    for slot, person in enumerate(people[:keypoints.shape[1]]):
+        keypoints[frame_idx, slot, :len(person)] = person
+
+    speaker = keypoints[frame_idx, 0]
+    return speaker[NECK, :2].copy() if speaker[NECK, 2] > 0 else previous_neck
+
+
+def run_openpose(video_path, output_json_dir):
+
+    if not OPENPOSE_BIN_PATH or not os.path.exists(OPENPOSE_BIN_PATH):
+        msg = f"OpenPose executable not found or path not configured correctly ({OPENPOSE_BIN_PATH}). Skipping OpenPose analysis."
+        print(msg)
+        return {"error": msg}
+
+    command = [
+        OPENPOSE_BIN_PATH,
+        "--video", video_path,
+        "--write_json", output_json_dir,
+        "--display", "0",
+        "--render_pose", "0"
+    ]
+    print(f"Running OpenPose command: {' '.join(command)}")
+
+    keypoints = np.zeros((256, POSE_MAX_PEOPLE, BODY_25_KEYPOINTS, 3), dtype=np.float32)
+    num_frames = 0
+    speaker_neck = None
+
+    def ingest(final):
+        nonlocal keypoints, num_frames, speaker_neck
+        pending = []
+        for filename in os.listdir(output_json_dir):
+            match = _KEYPOINT_FILE.search(filename)
+            if match:
+                pending.append((int(match.group(1)), filename))
+        pending.sort()
+        # While OpenPose is running the newest file may still be half-written; leave it for the next pass.
+        if not final:
+            pending = pending[:-1]
+        for frame_idx, filename in pending:
+            filepath = os.path.join(output_json_dir, filename)
+            keypoints = grow_rows(keypoints, frame_idx + 1, fill=0)
+            num_frames = max(num_frames, frame_idx + 1)
+            try:
+                speaker_neck = _ingest_keypoint_file(filepath, keypoints, frame_idx, speaker_neck)
+            except json.JSONDecodeError as e:
+                print(f"Error decoding JSON in {filename}: {e}")
+            except Exception as e:
+                print(f"Error reading or processing {filename}: {e}")
+            os.remove(filepath)
+
+    log_path = os.path.join(output_json_dir, "openpose.log")
+    process = None
+    try:
+        with open(log_path, 'w') as log:
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+            deadline = time.monotonic() + POSE_TIMEOUT_SECONDS
+            while process.poll() is None:
+                if time.monotonic() > deadline:
+                    error_msg = f"OpenPose did not finish within {POSE_TIMEOUT_SECONDS} seconds and was stopped."
+                    print(error_msg)
+                    return {"error": error_msg, "overall_score": 0}
+                ingest(final=False)
+                time.sleep(POSE_POLL_SECONDS)
+        ingest(final=True)
+
+        if process.returncode != 0:
+            with open(log_path, 'r', errors='replace') as log:
+                output = log.read()[-2000:]
+            error_msg = f"Error running OpenPose. Return code: {process.returncode}\nOutput: {output}"
+            print(error_msg)
+            return {"error": error_msg, "overall_score": 0}
+        print("OpenPose ran successfully.")
+
+    except FileNotFoundError:
+        error_msg = f"OpenPose executable not found at: {OPENPOSE_BIN_PATH}. Make sure it's installed and the path is correct."
+        print(error_msg)
+        return {"error": error_msg, "overall_score": 0}
+    except OSError as e:
+        error_msg = f"Error running OpenPose at {OPENPOSE_BIN_PATH}: {e}"
+        print(error_msg)
+        return {"error": error_msg, "overall_score": 0}
+    finally:
+        # Whatever went wrong above (timeout, unreadable output dir, a bogus frame index), don't leave OpenPose running.
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if num_frames == 0:
+        print("OpenPose ran but produced no JSON output files.")
+        return {"error": "OpenPose produced no output.", "overall_score": 0, "openpose_people_detected": 0}
+
+    print(f"Ingested OpenPose keypoints for {num_frames} frames.")
+    # Kept as float32: frame-to-frame wrist motion is a few pixels, below float16 resolution on HD frames.
+    return {"keypoints": keypoints[:num_frames]}
+
+
+POSE_BACKENDS = {
+    'openpose': run_openpose,
+}
+
+
+def register_pose_backend(name, backend):
+
+    POSE_BACKENDS[name] = backend
+
+
+def run_pose_backend(video_path, output_json_dir):
+
+    backend = POSE_BACKENDS.get(POSE_BACKEND)
+    if backend is None:
+        msg = f"Unknown pose backend '{POSE_BACKEND}'. Available: {', '.join(sorted(POSE_BACKENDS))}."
+        print(msg)
+        return {"error": msg}
+    return backend(video_path, output_json_dir)
+
+
+def _angle_from_vertical(top, bottom):
+
+    dx = top[..., 0] - bottom[..., 0]
+    dy = bottom[..., 1] - top[..., 1]
+    return np.degrees(np.arctan2(np.abs(dx), dy))
+
+
+def pose_metrics(keypoints):
+
+    # keypoints: frames x people x BODY_25_KEYPOINTS x (x, y, confidence); 0 confidence means missing.
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    confidence = keypoints[..., 2]
+    people_per_frame = (confidence > 0).any(axis=2).sum(axis=1)
+
+    speaker = keypoints[:, 0]
+    present = speaker[..., 2] > 0
+    detected = present.any(axis=1)
+    metrics = {
+        "people_per_frame": people_per_frame,
+        "keypoint_confidence": None,
+        "shoulder_tilt_deg": None,
+        "torso_lean_deg": None,
+        "hand_movement": None
+    }
+    if not detected.any():
+        return metrics
+
+    metrics['keypoint_confidence'] = float(speaker[..., 2][present].mean())
+
+    shoulders = present[:, R_SHOULDER] & present[:, L_SHOULDER]
+    if shoulders.any():
+        delta = speaker[shoulders, L_SHOULDER, :2] - speaker[shoulders, R_SHOULDER, :2]
+        tilt = np.degrees(np.arctan2(np.abs(delta[:, 1]), np.abs(delta[:, 0])))
+        metrics['shoulder_tilt_deg'] = float(tilt.mean())
+
+    torso = present[:, NECK] & present[:, MID_HIP]
+    if torso.any():
+        metrics['torso_lean_deg'] = float(_angle_from_vertical(speaker[torso, NECK], speaker[torso, MID_HIP]).mean())
+
+    # Wrist travel between consecutive frames, in shoulder widths so it is independent of framing.
+    if shoulders.any():
+        shoulder_width = float(np.median(np.linalg.norm(delta, axis=1)))
+        movements = []
+        # Skip frame pairs where the tracked speaker's neck jumps, i.e. slot 0 changed person.
+        neck_step = np.linalg.norm(speaker[1:, NECK, :2] - speaker[:-1, NECK, :2], axis=1)
+        same_person = present[1:, NECK] & present[:-1, NECK] & (neck_step <= SPEAKER_JUMP_SHOULDER_WIDTHS * shoulder_width)
+        for wrist in (R_WRIST, L_WRIST):
+            both = present[1:, wrist] & present[:-1, wrist] & same_person
+            if both.any():
+                step = np.linalg.norm(speaker[1:, wrist, :2] - speaker[:-1, wrist, :2], axis=1)[both]
+                movements.append(step)
+        if movements and shoulder_width > 0:
+            metrics['hand_movement'] = float(np.concatenate(movements).mean() / shoulder_width)
+
+    return metrics
+
+
+def score_openpose(features):
+
+    if features is None or 'error' in features:
+        return features
+
+    # Sessions stored before keypoint ingestion only carry per-frame people counts.
+    if 'keypoints' in features:
+        metrics = pose_metrics(features['keypoints'])
+        people_per_frame = metrics.pop('people_per_frame')
+    else:
+        metrics = {}
+        people_per_frame = features['people']
+
+    frames_with_people = int(np.count_nonzero(people_per_frame))
+    total_frames_analyzed = len(people_per_frame)
+    detection_consistency = (frames_with_people / total_frames_analyzed) if total_frames_analyzed > 0 else 0
+    openpose_score = int(detection_consistency * 100)
+
+    print(f"OpenPose Analysis Complete: Detected people in {frames_with_people}/{total_frames_analyzed} frames. Score={openpose_score}")
+    result = {
+        "overall_score": openpose_score,
+        "openpose_frames_analyzed": total_frames_analyzed,
+        "openpose_frames_with_people": frames_with_people
+    }
+    for key, value in metrics.items():
+        result[f"openpose_{key}"] = value
+    return result
@@ -0,0 +1,108 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 640          # 40 ms, long enough to hold two periods of a 60 Hz voice
+HOP_LENGTH = 160            # 10 ms
+PITCH_MIN_HZ = 60
+PITCH_MAX_HZ = 400
+VOICING_THRESHOLD = 0.45    # normalised autocorrelation peak needed to call a frame periodic
+OCTAVE_TOLERANCE = 0.9      # earliest lag within this fraction of the best peak wins, avoiding sub-octave picks
+MIN_PAUSE_SECONDS = 0.3
+MIN_DYNAMIC_RANGE_DB = 8    # p90 - p10 energy spread needed before the adaptive voicing gate is trusted
+SILENCE_DB = -50            # absolute floor used when there is no speech/pause contrast
+BLOCK_FRAMES = 2048         # frames per FFT batch, bounds memory on long recordings
+
+
+def frame_energy_db(samples):
+
+    # Sliding-window mean square from one cumulative sum: O(n) regardless of frame overlap.
+    num_frames = 1 + (len(samples) - FRAME_LENGTH) // HOP_LENGTH if len(samples) >= FRAME_LENGTH else 0
+    csum = np.concatenate(([0.0], np.cumsum(np.square(samples, dtype=np.float64))))
+    starts = np.arange(num_frames) * HOP_LENGTH
+    mean_square = (csum[starts + FRAME_LENGTH] - csum[starts]) / FRAME_LENGTH
+    return 10 * np.log10(mean_square + 1e-10)
+
+
+def pitch_contour(samples):
+
+    if len(samples) < FRAME_LENGTH:
+        return np.zeros(0, dtype=np.float32)
+
+    frames = sliding_window_view(samples, FRAME_LENGTH)[::HOP_LENGTH]
+    min_lag = SAMPLE_RATE // PITCH_MAX_HZ
+    max_lag = SAMPLE_RATE // PITCH_MIN_HZ
+    # Lags up to max_lag only need FRAME_LENGTH + max_lag points to avoid circular wrap-around.
+    n_fft = 1 << int(np.ceil(np.log2(FRAME_LENGTH + max_lag)))
+    # Undo the linear taper of the biased autocorrelation so long lags aren't penalised.
+    unbias = FRAME_LENGTH / (FRAME_LENGTH - np.arange(max_lag + 1))
+
+    pitch = np.full(len(frames), np.nan, dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES].astype(np.float32)
+        block -= block.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(block, n=n_fft, axis=1)
+        autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=1)[:, :max_lag + 1]
+        autocorr *= unbias
+
+        zero_lag = autocorr[:, 0]
+        search = autocorr[:, min_lag:]
+        best = search.max(axis=1, keepdims=True)
+        inner = search[:, 1:-1]
+        candidates = (inner >= search[:, :-2]) & (inner >= search[:, 2:]) & (inner >= OCTAVE_TOLERANCE * best)
+        lags = min_lag + np.where(candidates.any(axis=1), np.argmax(candidates, axis=1) + 1, np.argmax(search, axis=1))
+        peak = autocorr[np.arange(len(block)), lags]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            periodic = (zero_lag > 0) & (peak / zero_lag > VOICING_THRESHOLD)
+        pitch[start:start + len(block)] = np.where(periodic, SAMPLE_RATE / lags, np.nan)
+
+    return pitch
+
+
+def extract_prosody(samples):
+
+    return {
+        "energy_db": frame_energy_db(samples).astype(np.float16),
+        "pitch_hz": pitch_contour(samples).astype(np.float16),
+        "hop_seconds": HOP_LENGTH / SAMPLE_RATE
+    }
+
+
+def voiced_mask(energy_db):
+
+    # Adaptive gate between the quiet floor and typical speech level of this recording.
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor, speech_level = np.percentile(energy_db, [10, 90])
+    # Without real contrast (continuous sound, steady noise, silence) the gate would only split
+    # noise-level wobble, so fall back to a fixed absolute level for the whole recording.
+    if speech_level - noise_floor < MIN_DYNAMIC_RANGE_DB:
+        return energy_db > SILENCE_DB
+    return energy_db > noise_floor + 0.35 * (speech_level - noise_floor)
+
+
+def pause_durations(voiced, hop_seconds):
+
+    # Silent runs strictly between the first and last voiced frame.
+    voiced_idx = np.flatnonzero(voiced)
+    if len(voiced_idx) < 2:
+        return np.zeros(0, dtype=np.float32)
+    inner = voiced[voiced_idx[0]:voiced_idx[-1] + 1]
+    edges = np.diff(inner.astype(np.int8))
+    run_starts = np.flatnonzero(edges == -1) + 1
+    run_ends = np.flatnonzero(edges == 1) + 1
+    durations = (run_ends - run_starts) * hop_seconds
+    return durations[durations >= MIN_PAUSE_SECONDS].astype(np.float32)
+
+
+def speaking_rate_variability(segment_start, segment_end, segment_text):
+
+    durations = np.asarray(segment_end, dtype=np.float32) - np.asarray(segment_start, dtype=np.float32)
+    word_counts = np.array([len(str(text).split()) for text in segment_text], dtype=np.float32)
+    keep = durations > 0.5
+    if keep.sum() < 2:
+        return None
+    rates = word_counts[keep] / durations[keep] * 60
+    mean_rate = rates.mean()
+    return float(rates.std() / mean_rate) if mean_rate > 0 else None
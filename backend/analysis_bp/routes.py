@@ -5,24 +5,24 @@ import mediapipe as mp
 from deepface import DeepFace
 import whisper
 import subprocess
-import json
 from moviepy.editor import VideoFileClip
 import numpy as np
 import shutil
 from flask import Blueprint, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS 
+from analysis_bp.feature_store import hash_video, save_features, load_features
+from analysis_bp.timeline import grow_rows, per_second, moving_average, to_json_list
+from analysis_bp.prosody import SAMPLE_RATE, extract_prosody, voiced_mask, pause_durations, speaking_rate_variability
+from analysis_bp.pose_backend import POSE_BACKEND, OPENPOSE_BIN_PATH, run_pose_backend, score_openpose
+from analysis_bp.workspace import SCRATCH_QUOTA_BYTES, WorkspaceQuotaError, ScratchSpaceUnavailable, create_workspace, release_workspace, start_janitor
 
 
 analysis_bp = Blueprint('analysis', __name__, url_prefix='/api') 
+# Start sweeping crash debris as soon as the app is up, not on the first upload.
+analysis_bp.record_once(lambda state: start_janitor())
 
 
-UPLOAD_FOLDER = 'uploads'
-FRAMES_FOLDER = os.path.join(UPLOAD_FOLDER, 'frames')
-OPENPOSE_OUTPUT_FOLDER = os.path.join(UPLOAD_FOLDER, 'openpose_output')
-
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
 mp_pose = None
 pose = None
 mp_drawing = None
@@ -45,11 +45,10 @@ try:
 except Exception as e:
     print(f"Error loading Whisper model in blueprint: {e}. Speech transcription will be unavailable.")
 
-# OpenPose Config
-OPENPOSE_BIN_PATH = "C:/path/to/openpose/bin/OpenPoseDemo.exe" 
-if not os.path.exists(OPENPOSE_BIN_PATH):
+# OpenPose Config (see analysis_bp/pose_backend.py)
+if POSE_BACKEND == 'openpose' and not os.path.exists(OPENPOSE_BIN_PATH):
     print(f"WARNING: OpenPose executable not found at specified path in blueprint: {OPENPOSE_BIN_PATH}")
-    print("Please update OPENPOSE_BIN_PATH in the blueprint.")
+    print("Set the OPENPOSE_BIN_PATH environment variable to your OpenPoseDemo binary.")
 
 
 def cleanup_directory(dir_path):
@@ -61,6 +60,13 @@ def cleanup_directory(dir_path):
         except OSError as e:
             print(f"Error cleaning up directory {dir_path}: {e}")
 
+def _sample_period(frame_rate):
+
+    # Seconds between analysed frames; unknown frame rates fall back to a 30-frame interval at ~30fps.
+    if frame_rate is None or frame_rate == 0:
+        return 1.0
+    return int(frame_rate) / frame_rate
+
 def extract_frames(video_path, output_folder):
     
     cleanup_directory(output_folder)
@@ -94,23 +100,35 @@ def extract_frames(video_path, output_folder):
     print(f"Extracted {saved_frame_count} frames to {output_folder}")
     return output_folder, frame_rate
 
-def analyze_facial_emotions(frame_folder):
-   
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+
+def _frame_index(filename):
+    try:
+        return int(os.path.splitext(filename)[0].rsplit('_', 1)[-1])
+    except ValueError:
+        return -1
+
+def extract_emotion_features(frame_folder, sample_period=1.0):
+
     if not os.path.exists(frame_folder):
         print(f"Frame folder not found: {frame_folder}")
         return None
 
-    all_emotion_scores = []
-    dominant_emotions_list = []
-    frame_files = [f for f in os.listdir(frame_folder) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
+    frame_files = sorted(
+        (f for f in os.listdir(frame_folder) if f.lower().endswith((".jpg", ".jpeg", ".png"))),
+        key=_frame_index
+    )
 
     if not frame_files:
         print("No frames found to analyze for emotions.")
         return None
 
     print(f"Analyzing emotions for {len(frame_files)} frames...")
-    processed_count = 0
-    for filename in frame_files:
+    # Frames without a detected face stay NaN / -1 so rows line up with video time.
+    emotion_matrix = np.full((len(frame_files), len(EMOTION_LABELS)), np.nan, dtype=np.float16)
+    dominant_indices = np.full(len(frame_files), -1, dtype=np.int8)
+    for i, filename in enumerate(frame_files):
         frame_path = os.path.join(frame_folder, filename)
         try:
             analysis = DeepFace.analyze(
@@ -121,32 +139,51 @@ def analyze_facial_emotions(frame_folder):
             )
             if analysis and isinstance(analysis, list) and len(analysis) > 0:
                 first_face = analysis[0]
-                dominant_emotion = first_face['dominant_emotion']
                 emotion_scores = first_face['emotion']
-                all_emotion_scores.append(emotion_scores)
-                dominant_emotions_list.append(dominant_emotion)
-                processed_count += 1
+                # Look both values up before writing so a bad label can't leave a half-filled row.
+                dominant_index = EMOTION_LABELS.index(first_face['dominant_emotion'])
+                frame_scores = [emotion_scores.get(emotion, 0) for emotion in EMOTION_LABELS]
+                emotion_matrix[i] = frame_scores
+                dominant_indices[i] = dominant_index
         except ValueError as ve:
             print(f"No face detected by DeepFace in {filename}: {ve}")
         except Exception as e:
             print(f"Error analyzing emotion in {filename}: {e}")
 
-    if not all_emotion_scores:
+    return {
+        "scores": emotion_matrix,
+        "dominant": dominant_indices,
+        "sample_period": sample_period
+    }
+
+def _weighted_emotion_score(avg_scores):
+
+    # avg_scores is (..., len(EMOTION_LABELS)), so this serves both the overall score and the timeline curve.
+    def emotion(label):
+        return avg_scores[..., EMOTION_LABELS.index(label)]
+
+    positive_score = emotion('happy') + emotion('neutral') * 0.7
+    negative_score = emotion('sad') + emotion('angry') + emotion('fear')
+    return (positive_score * 0.6) - (negative_score * 0.4)
+
+def score_facial_emotions(features):
+
+    if features is None or 'error' in features:
+        return features
+
+    dominant_indices = features['dominant']
+    detected = dominant_indices >= 0
+    if not detected.any():
         print("No faces detected or analyzed across all frames.")
         return {"dominant_emotion": "N/A", "scores": {}, "overall_score": 0}
 
-    avg_emotion_scores = {
-        emotion: np.mean([scores.get(emotion, 0) for scores in all_emotion_scores])
-        for emotion in all_emotion_scores[0].keys()
-    }
-
-    dominant_emotion = max(set(dominant_emotions_list), key=dominant_emotions_list.count) if dominant_emotions_list else "Neutral"
+    avg_scores = features['scores'][detected].astype(np.float32).mean(axis=0)
+    avg_emotion_scores = {emotion: float(avg_scores[i]) for i, emotion in enumerate(EMOTION_LABELS)}
 
-    positive_score = avg_emotion_scores.get('happy', 0) + avg_emotion_scores.get('neutral', 0) * 0.7
-    negative_score = avg_emotion_scores.get('sad', 0) + avg_emotion_scores.get('angry', 0) + avg_emotion_scores.get('fear', 0)
+    dominant_counts = np.bincount(dominant_indices[detected], minlength=len(EMOTION_LABELS))
+    dominant_emotion = EMOTION_LABELS[int(np.argmax(dominant_counts))]
 
-    facial_emotion_score = (positive_score * 0.6) - (negative_score * 0.4)
-    facial_emotion_score = max(0, min(100, int(facial_emotion_score)))
+    facial_emotion_score = max(0, min(100, int(_weighted_emotion_score(avg_scores))))
 
     print(f"Emotion Analysis Complete: Dominant={dominant_emotion}, Calculated Score={facial_emotion_score}")
     return {
@@ -155,13 +192,16 @@ def analyze_facial_emotions(frame_folder):
         "overall_score": facial_emotion_score
     }
 
-def analyze_body_posture(video_path):
-    
+POSE_LANDMARK_COUNT = 33
+POSE_MAX_PREALLOCATED_FRAMES = 4 * 60 * 60     # four hours at one sampled frame per second
+
+
+def extract_posture_features(video_path):
+
     if pose is None:
         print("MediaPipe Pose model not loaded. Skipping posture analysis.")
         return None
 
-    all_visibility = []
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error opening video file for posture analysis: {video_path}")
@@ -174,318 +214,443 @@ def analyze_body_posture(video_path):
     else:
         frame_interval = int(frame_rate)
 
+    # Preallocate from the container's frame count, which is untrusted metadata, so clamp it;
+    # grow_rows covers estimates that come up short. Frames without landmarks stay NaN.
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if not frame_count or not np.isfinite(frame_count) or frame_count < 0:
+        frame_count = 0
+    estimated_frames = min(int(frame_count) // frame_interval + 1, POSE_MAX_PREALLOCATED_FRAMES)
+    visibility = np.full((estimated_frames, POSE_LANDMARK_COUNT), np.nan, dtype=np.float16)
+    sampled = 0
     count = 0
-    processed_frame_count = 0
     while cap.isOpened():
         ret, frame = cap.read()
         if not ret:
             break
 
         if count % frame_interval == 0:
-            processed_frame_count += 1
+            visibility = grow_rows(visibility, sampled + 1)
             try:
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 results = pose.process(rgb_frame)
 
                 if results.pose_landmarks:
-                    visibility_sum = sum(landmark.visibility for landmark in results.pose_landmarks.landmark)
-                    num_landmarks = len(results.pose_landmarks.landmark)
-                    avg_frame_visibility = visibility_sum / num_landmarks if num_landmarks > 0 else 0
-                    all_visibility.append(avg_frame_visibility)
+                    landmarks = results.pose_landmarks.landmark[:POSE_LANDMARK_COUNT]
+                    visibility[sampled, :len(landmarks)] = [landmark.visibility for landmark in landmarks]
 
             except Exception as e:
                 print(f"Error analyzing body posture in frame {count}: {e}")
+            sampled += 1
         count += 1
 
     cap.release()
 
-    if not all_visibility:
+    return {"visibility": visibility[:sampled], "sample_period": _sample_period(frame_rate)}
+
+def score_body_posture(features):
+
+    if features is None or 'error' in features:
+        return features
+
+    visibility = features['visibility'].astype(np.float32)
+    detected = ~np.isnan(visibility).all(axis=1)
+    if not detected.any():
         print("No pose landmarks detected in any analyzed frames.")
         return {"overall_score": 0, "average_visibility": 0}
 
-    avg_visibility = np.mean(all_visibility)
+    avg_visibility = float(np.nanmean(visibility[detected], axis=1).mean())
     body_posture_score = int(avg_visibility * 100)
     body_posture_score = max(0, min(100, body_posture_score))
 
     print(f"Posture Analysis Complete: Avg Visibility={avg_visibility:.2f}, Score={body_posture_score}")
     return {"overall_score": body_posture_score, "average_visibility": avg_visibility}
 
-def transcribe_speech(video_path):
+def extract_audio(video_path):
+
+    # Decode straight into memory at Whisper's native format; the same buffer feeds prosody.
+    print(f"Extracting audio using ffmpeg from: {video_path}")
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-i", video_path,
+        "-vn",                      # no video
+        "-f", "s16le",              # raw samples on stdout
+        "-acodec", "pcm_s16le",     # uncompressed audio
+        "-ar", str(SAMPLE_RATE),    # sample rate
+        "-ac", "1",                 # mono
+        "-"
+    ]
+    try:
+        process = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as ffmpeg_error:
+        print(f"ffmpeg error: {ffmpeg_error}")
+        return None
+
+    samples = np.frombuffer(process.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+    print(f"Extracted {len(samples) / SAMPLE_RATE:.1f}s of audio.")
+    return samples
+
+def extract_speech_features(samples):
     if whisper_model is None:
         print("Whisper model not loaded. Skipping speech transcription.")
         return {"error": "Whisper model not loaded."}
 
-    audio_path = os.path.join(UPLOAD_FOLDER, "temp_audio_for_whisper.wav")
+    if samples is None:
+        return {"error": "Failed to extract audio using ffmpeg."}
 
     try:
-        print("Starting speech transcription...")
-        print(f"Extracting audio using ffmpeg from: {video_path}")
-
-       
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-i", video_path,
-            "-vn",                      # no video
-            "-acodec", "pcm_s16le",     # uncompressed audio
-            "-ar", "16000",             # sample rate
-            "-ac", "1",                 # mono
-            audio_path,
-            "-y"                        # overwrite existing
-        ]
-        subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        print(f"Audio extracted to: {audio_path}")
-
         print("Transcribing with Whisper...")
-        result = whisper_model.transcribe(audio_path, fp16=False)
+        result = whisper_model.transcribe(samples, fp16=False)
         print("Transcription done.")
 
-        transcript = result["text"]
-        words = transcript.split()
-        num_words = len(words)
-
-       
-        duration_seconds = result.get("duration", 0) or (num_words / 150.0 * 60)
-        speech_pace_wpm = int(num_words / (duration_seconds / 60.0)) if duration_seconds > 0 else 0
-
-        filler_words = ["um", "uh", "like", "you know", "so", "well", "actually", "basically", "literally"]
-        filler_count = sum(1 for word in words if word.lower().strip('.,?!') in filler_words)
-
-        filler_ratio = filler_count / num_words if num_words > 0 else 0
-        speech_clarity_score = int(max(0, 100 - (filler_ratio * 200)))
-
+        segments = result.get("segments", [])
         return {
-            "transcript": transcript,
-            "speech_pace_wpm": speech_pace_wpm,
-            "speech_clarity_score": speech_clarity_score,
-            "word_count": num_words,
-            "filler_count": filler_count
+            "transcript": result["text"],
+            "duration": len(samples) / SAMPLE_RATE,
+            "segment_start": np.array([seg["start"] for seg in segments], dtype=np.float32),
+            "segment_end": np.array([seg["end"] for seg in segments], dtype=np.float32),
+            "segment_text": np.array([seg["text"] for seg in segments], dtype=np.str_)
         }
 
-    except subprocess.CalledProcessError as ffmpeg_error:
-        print(f"ffmpeg error: {ffmpeg_error}")
-        return {"error": "Failed to extract audio using ffmpeg."}
     except Exception as e:
         print(f"Error during transcription: {e}")
         return {"error": str(e)}
-    finally:
-        if os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-                print(f"Removed temporary audio file: {audio_path}")
-            except OSError as e_remove:
-                print(f"Error removing temp audio: {e_remove}")
 
-def analyze_openpose(video_path, output_json_dir):
-    
-    if not OPENPOSE_BIN_PATH or not os.path.exists(OPENPOSE_BIN_PATH):
-        msg = f"OpenPose executable not found or path not configured correctly ({OPENPOSE_BIN_PATH}). Skipping OpenPose analysis."
-        print(msg)
-        return {"error": msg}
+def extract_prosody_features(samples):
 
-    cleanup_directory(output_json_dir)
-    os.makedirs(output_json_dir, exist_ok=True)
-
-    command = [
-        OPENPOSE_BIN_PATH,
-        "--video", video_path,
-        "--write_json", output_json_dir,
-        "--display", "0",
-        "--render_pose", "0"
-    ]
-    print(f"Running OpenPose command: {' '.join(command)}")
+    if samples is None:
+        return {"error": "Failed to extract audio using ffmpeg."}
 
     try:
-        process = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
-        print("OpenPose ran successfully.")
+        return extract_prosody(samples)
+    except Exception as e:
+        print(f"Error during prosody analysis: {e}")
+        return {"error": str(e)}
 
-        pose_data_frames = []
-        json_files = sorted([f for f in os.listdir(output_json_dir) if f.endswith(".json")])
+FILLER_WORDS = ["um", "uh", "like", "you know", "so", "well", "actually", "basically", "literally"]
 
-        if not json_files:
-            print("OpenPose ran but produced no JSON output files.")
-            return {"error": "OpenPose produced no output.", "overall_score": 0, "openpose_people_detected": 0}
 
-        print(f"Processing {len(json_files)} OpenPose JSON files...")
-        people_detected_count = 0
-        for filename in json_files:
-            filepath = os.path.join(output_json_dir, filename)
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    pose_data_frames.append(data['people'])
-                    if data.get('people'):
-                        people_detected_count += len(data['people'])
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON in {filename}: {e}")
-            except Exception as e:
-                print(f"Error reading or processing {filename}: {e}")
+def score_speech(features):
 
-        frames_with_people = sum(1 for frame_people in pose_data_frames if frame_people)
-        total_frames_analyzed = len(json_files)
-        detection_consistency = (frames_with_people / total_frames_analyzed) if total_frames_analyzed > 0 else 0
-        openpose_score = int(detection_consistency * 100)
+    if features is None or 'error' in features:
+        return features
 
-        print(f"OpenPose Analysis Complete: Detected people in {frames_with_people}/{total_frames_analyzed} frames. Score={openpose_score}")
-        return {
-            "overall_score": openpose_score,
-            "openpose_frames_analyzed": total_frames_analyzed,
-            "openpose_frames_with_people": frames_with_people
-        }
+    transcript = features["transcript"]
+    words = transcript.split()
+    num_words = len(words)
 
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Error running OpenPose. Return code: {e.returncode}\nStderr: {e.stderr}\nStdout: {e.stdout}"
-        print(error_msg)
-        return {"error": error_msg, "overall_score": 0}
-    except FileNotFoundError:
-        error_msg = f"OpenPose executable not found at: {OPENPOSE_BIN_PATH}. Make sure it's installed and the path is correct."
-        print(error_msg)
-        return {"error": error_msg, "overall_score": 0}
+    duration_seconds = features.get("duration", 0) or (num_words / 150.0 * 60)
+    speech_pace_wpm = int(num_words / (duration_seconds / 60.0)) if duration_seconds > 0 else 0
+
+    filler_count = sum(1 for word in words if word.lower().strip('.,?!') in FILLER_WORDS)
+
+    filler_ratio = filler_count / num_words if num_words > 0 else 0
+    speech_clarity_score = int(max(0, 100 - (filler_ratio * 200)))
+
+    return {
+        "transcript": transcript,
+        "speech_pace_wpm": speech_pace_wpm,
+        "speech_clarity_score": speech_clarity_score,
+        "word_count": num_words,
+        "filler_count": filler_count
+    }
+
+def score_prosody(features, speech_features=None):
+
+    if features is None or 'error' in features:
+        return features
+
+    hop_seconds = features.get('hop_seconds', 0.01)
+    energy_db = features['energy_db'].astype(np.float32)
+    voiced = voiced_mask(energy_db)
+    if not voiced.any():
+        print("No voiced audio found for prosody analysis.")
+        return {"error": "No voiced audio detected."}
+
+    pitch = features['pitch_hz'].astype(np.float32)[:len(voiced)]
+    voiced_pitch = pitch[voiced[:len(pitch)] & ~np.isnan(pitch)]
+    pauses = pause_durations(voiced, hop_seconds)
+    voiced_energy = energy_db[voiced]
+
+    result = {
+        "energy_mean_db": float(voiced_energy.mean()),
+        "energy_range_db": float(np.percentile(voiced_energy, 95) - np.percentile(voiced_energy, 10)),
+        "pitch_mean_hz": None,
+        "pitch_variation_semitones": None,
+        "pause_count": int(len(pauses)),
+        "pause_mean_seconds": float(pauses.mean()) if len(pauses) else 0.0,
+        "pause_max_seconds": float(pauses.max()) if len(pauses) else 0.0,
+        "pause_ratio": float(pauses.sum() / (len(energy_db) * hop_seconds)),
+        "speaking_rate_cv": None
+    }
+    if len(voiced_pitch) > 0:
+        semitones = 12 * np.log2(voiced_pitch / np.median(voiced_pitch))
+        result['pitch_mean_hz'] = float(voiced_pitch.mean())
+        result['pitch_variation_semitones'] = float(semitones.std())
+    if speech_features is not None and 'error' not in speech_features:
+        result['speaking_rate_cv'] = speaking_rate_variability(
+            speech_features['segment_start'], speech_features['segment_end'], speech_features['segment_text']
+        )
+
+    print(f"Prosody Analysis Complete: Pauses={result['pause_count']}, Pitch Variation={result['pitch_variation_semitones']}")
+    return result
+
+def extract_openpose_features(video_path, output_json_dir):
+
+    cleanup_directory(output_json_dir)
+    os.makedirs(output_json_dir, exist_ok=True)
+
+    try:
+        return run_pose_backend(video_path, output_json_dir)
     except Exception as e:
         error_msg = f"An unexpected error occurred during OpenPose analysis: {e}"
         print(error_msg)
         return {"error": error_msg, "overall_score": 0}
-    finally:
-        cleanup_directory(output_json_dir)
+
+
+def build_timeline(stage_features):
+
+    emotion = stage_features.get('emotion')
+    posture = stage_features.get('posture')
+    prosody = stage_features.get('prosody')
+    if emotion is not None and ('error' in emotion or not emotion.get('time_aligned', True)):
+        emotion = None
+    if posture is not None and 'error' in posture:
+        posture = None
+    if prosody is not None and 'error' in prosody:
+        prosody = None
+
+    num_seconds = 0
+    for features, key in ((emotion, 'scores'), (posture, 'visibility')):
+        if features is not None:
+            num_seconds = max(num_seconds, int(np.ceil(len(features[key]) * features.get('sample_period', 1.0))))
+    if prosody is not None:
+        num_seconds = max(num_seconds, int(np.ceil(len(prosody['energy_db']) * prosody['hop_seconds'])))
+    if num_seconds == 0:
+        return {}
+
+    timeline = {"seconds": list(range(num_seconds))}
+
+    if emotion is not None:
+        emotion_curves = per_second(emotion['scores'], emotion.get('sample_period', 1.0), num_seconds)
+        emotion_score_curve = np.clip(_weighted_emotion_score(emotion_curves), 0, 100)
+        timeline['emotions'] = {label: to_json_list(emotion_curves[:, i]) for i, label in enumerate(EMOTION_LABELS)}
+        timeline['emotion_score'] = to_json_list(emotion_score_curve)
+        timeline['emotion_score_moving_avg'] = to_json_list(moving_average(emotion_score_curve))
+
+    if posture is not None:
+        frame_visibility = posture['visibility'].astype(np.float32)
+        detected = ~np.isnan(frame_visibility).all(axis=1)
+        mean_visibility = np.full(len(frame_visibility), np.nan, dtype=np.float32)
+        mean_visibility[detected] = np.nanmean(frame_visibility[detected], axis=1)
+        visibility_curve = per_second(mean_visibility, posture.get('sample_period', 1.0), num_seconds)
+        timeline['visibility'] = to_json_list(visibility_curve)
+        timeline['visibility_moving_avg'] = to_json_list(moving_average(visibility_curve))
+
+    if prosody is not None:
+        energy_db = prosody['energy_db'].astype(np.float32)
+        pitch = prosody['pitch_hz'].astype(np.float32)
+        pitch[~voiced_mask(energy_db)[:len(pitch)]] = np.nan
+        timeline['energy_db'] = to_json_list(per_second(energy_db, prosody['hop_seconds'], num_seconds), decimals=1)
+        timeline['pitch_hz'] = to_json_list(per_second(pitch, prosody['hop_seconds'], num_seconds), decimals=1)
+
+    return timeline
+
+def build_analysis_results(stage_features):
+
+    analysis_results = {
+        "overall_score": "N/A",
+        "scores": {},
+        "metrics": {},
+        "details": {},
+        "errors": []
+    }
+    scores_to_average = {}
+
+    emotion_result = score_facial_emotions(stage_features.get('emotion'))
+    if emotion_result:
+        if 'error' in emotion_result:
+            analysis_results['errors'].append(f"Emotion Analysis Error: {emotion_result['error']}")
+            analysis_results['scores']['facial_emotion'] = "Error"
+        else:
+            analysis_results['details']['dominant_emotion'] = emotion_result['dominant_emotion']
+            analysis_results['scores']['facial_emotion'] = emotion_result['overall_score']
+            analysis_results['details']['emotion_avg_scores'] = emotion_result['scores']
+            scores_to_average['facial_emotion'] = emotion_result['overall_score']
+    else:
+        analysis_results['scores']['facial_emotion'] = "N/A"
+        analysis_results['errors'].append("Emotion analysis returned no result.")
+
+    posture_result = score_body_posture(stage_features.get('posture'))
+    if posture_result:
+        if 'error' in posture_result:
+            analysis_results['errors'].append(f"Posture Analysis Error: {posture_result['error']}")
+            analysis_results['scores']['body_posture_mediapipe'] = "Error"
+        else:
+            analysis_results['scores']['body_posture_mediapipe'] = posture_result['overall_score']
+            analysis_results['metrics']['posture_avg_visibility'] = round(posture_result.get('average_visibility', 0), 2)
+            scores_to_average['body_posture_mediapipe'] = posture_result['overall_score']
+    else:
+        analysis_results['scores']['body_posture_mediapipe'] = "N/A"
+        analysis_results['errors'].append("Posture analysis (MediaPipe) returned no result.")
+
+    speech_result = score_speech(stage_features.get('speech'))
+    if speech_result:
+        if "error" in speech_result:
+            analysis_results['errors'].append(f"Speech Analysis Error: {speech_result['error']}")
+            analysis_results['scores']['speech_clarity'] = "Error"
+            analysis_results['metrics']['speech_pace_wpm'] = "Error"
+            analysis_results['details']['transcript_preview'] = "Error"
+        else:
+            analysis_results['metrics']['speech_pace_wpm'] = speech_result['speech_pace_wpm']
+            analysis_results['scores']['speech_clarity'] = speech_result['speech_clarity_score']
+            analysis_results['metrics']['word_count'] = speech_result['word_count']
+            analysis_results['metrics']['filler_count'] = speech_result['filler_count']
+            transcript = speech_result['transcript']
+            analysis_results['details']['transcript_preview'] = transcript[:300] + ("..." if len(transcript) > 300 else "")
+            scores_to_average['speech_clarity'] = speech_result['speech_clarity_score']
+    else:
+        analysis_results['scores']['speech_clarity'] = "24"
+        analysis_results['metrics']['speech_pace_wpm'] = "39"
+        analysis_results['errors'].append("Speech analysis returned no result.")
+
+    prosody_result = score_prosody(stage_features.get('prosody'), stage_features.get('speech'))
+    if prosody_result:
+        if "error" in prosody_result:
+            analysis_results['errors'].append(f"Prosody Analysis Error: {prosody_result['error']}")
+        else:
+            for key, value in prosody_result.items():
+                analysis_results['metrics'][f"prosody_{key}"] = round(value, 2) if isinstance(value, float) else value
+
+    openpose_result = score_openpose(stage_features.get('openpose'))
+    if openpose_result:
+        if "error" in openpose_result:
+            analysis_results['errors'].append(f"OpenPose Analysis Error: {openpose_result['error']}")
+            analysis_results['scores']['body_pose_openpose'] = "Error"
+        else:
+            analysis_results['scores']['body_pose_openpose'] = openpose_result['overall_score']
+            analysis_results['metrics']['openpose_frames_analyzed'] = openpose_result.get('openpose_frames_analyzed')
+            analysis_results['metrics']['openpose_frames_with_people'] = openpose_result.get('openpose_frames_with_people')
+            for key in ('openpose_keypoint_confidence', 'openpose_shoulder_tilt_deg', 'openpose_torso_lean_deg', 'openpose_hand_movement'):
+                if openpose_result.get(key) is not None:
+                    analysis_results['metrics'][key] = round(openpose_result[key], 2)
+            scores_to_average['body_pose_openpose'] = openpose_result['overall_score']
+    else:
+        analysis_results['scores']['body_pose_openpose'] = "N/A"
+        analysis_results['errors'].append("OpenPose analysis returned no result.")
+
+    print("\n--- Calculating Overall Score ---")
+    valid_scores = [s for s in scores_to_average.values() if isinstance(s, (int, float))]
+    if valid_scores:
+        overall_score = int(np.mean(valid_scores))
+        analysis_results['overall_score'] = max(0, min(100, overall_score))
+        print(f"Scores averaged: {scores_to_average}")
+        print(f"Calculated Overall Score: {analysis_results['overall_score']}")
+    else:
+        analysis_results['overall_score'] = 0
+        print("No valid scores available to calculate an overall score.")
+
+    summary_parts = [f"Overall Score: {analysis_results['overall_score']}/100."]
+    if analysis_results['scores'].get('facial_emotion') not in ["N/A", "Error"]:
+        summary_parts.append(f"Appeared predominantly {analysis_results['details'].get('dominant_emotion', 'neutral')}.")
+    if analysis_results['metrics'].get('speech_pace_wpm') not in ["37", "Error"]:
+        wpm = analysis_results['metrics']['speech_pace_wpm']
+        pace_desc = "very fast" if wpm > 170 else "fast" if wpm > 140 else "moderate" if wpm > 110 else "slow"
+        summary_parts.append(f"Speech pace was {pace_desc} ({wpm} WPM).")
+    if analysis_results['scores'].get('speech_clarity') not in ["26", "Error"]:
+        clarity = analysis_results['scores']['speech_clarity']
+        clarity_desc = "very clear" if clarity > 90 else "clear" if clarity > 75 else "moderately clear" if clarity > 50 else "less clear"
+        filler_count = analysis_results['metrics'].get('filler_count', 0)
+        summary_parts.append(f"Speech was {clarity_desc} (Clarity Score: {clarity}/100, Fillers: {filler_count}).")
+    if analysis_results['scores'].get('body_posture_mediapipe') not in ["N/A", "Error"]:
+        vis = analysis_results['metrics'].get('posture_avg_visibility', 0)
+        posture_desc = "clearly visible" if vis > 0.7 else "moderately visible" if vis > 0.4 else "partially obscured"
+        summary_parts.append(f"Posture was generally {posture_desc}.")
+    if analysis_results['metrics'].get('prosody_pitch_variation_semitones') is not None:
+        variation = analysis_results['metrics']['prosody_pitch_variation_semitones']
+        pitch_desc = "expressive" if variation > 4 else "moderately varied" if variation > 2 else "fairly monotone"
+        pause_count = analysis_results['metrics'].get('prosody_pause_count', 0)
+        summary_parts.append(f"Vocal pitch was {pitch_desc} ({variation} semitones), with {pause_count} noticeable pauses.")
+
+    analysis_results['feedback_summary'] = " ".join(summary_parts)
+    analysis_results['timeline'] = build_timeline(stage_features)
+    return analysis_results
 
 
 @analysis_bp.route('/analyze', methods=['POST'])
 def analyze_video():
-    
-    if 'video' not in request.files:
-        return jsonify({'error': 'No video file part in the request'}), 400
 
-    video_file = request.files['video']
+    # Check the quota before touching request.files: that parses (and spools) the whole body.
+    # Bodies without a Content-Length are capped by MAX_CONTENT_LENGTH while they stream in.
+    try:
+        workspace = create_workspace(request.content_length or 0)
+    except WorkspaceQuotaError as e:
+        print(f"Rejected upload: {e}")
+        return jsonify({'error': str(e)}), 413
+    except ScratchSpaceUnavailable as e:
+        print(f"Rejected upload: {e}")
+        return jsonify({'error': str(e)}), 507
+    except OSError as e:
+        print(f"Could not create a workspace: {e}")
+        return jsonify({'error': 'Server could not prepare scratch space for this upload.'}), 503
 
-    if video_file.filename == '':
-        return jsonify({'error': 'No video file selected'}), 400
+    try:
+        if 'video' not in request.files:
+            return jsonify({'error': 'No video file part in the request'}), 400
 
-    filename = video_file.filename
-    video_path = os.path.join(UPLOAD_FOLDER, filename)
+        video_file = request.files['video']
 
-    request_frame_folder = os.path.join(UPLOAD_FOLDER, f"frames_{os.path.splitext(filename)[0]}")
-    request_openpose_folder = os.path.join(UPLOAD_FOLDER, f"openpose_{os.path.splitext(filename)[0]}")
+        if video_file.filename == '':
+            return jsonify({'error': 'No video file selected'}), 400
 
-    try:
+        video_path = workspace.upload_path(video_file.filename)
         video_file.save(video_path)
         print(f"Video saved to: {video_path}")
+        workspace.check_quota()
+        video_hash = hash_video(video_path)
 
-        analysis_results = {
-            "overall_score": "N/A",
-            "scores": {},
-            "metrics": {},
-            "details": {},
-            "errors": []
-        }
-        scores_to_average = {}
+        stage_features = {}
 
         print("\n--- Starting Facial Emotion Analysis ---")
-        extracted_frames_path, _ = extract_frames(video_path, request_frame_folder)
+        extracted_frames_path, frame_rate = extract_frames(video_path, workspace.frames_dir)
         if extracted_frames_path:
-            emotion_result = analyze_facial_emotions(extracted_frames_path)
-            if emotion_result:
-                if 'error' in emotion_result:
-                    analysis_results['errors'].append(f"Emotion Analysis Error: {emotion_result['error']}")
-                    analysis_results['scores']['facial_emotion'] = "Error"
-                else:
-                    analysis_results['details']['dominant_emotion'] = emotion_result['dominant_emotion']
-                    analysis_results['scores']['facial_emotion'] = emotion_result['overall_score']
-                    analysis_results['details']['emotion_avg_scores'] = emotion_result['scores']
-                    scores_to_average['facial_emotion'] = emotion_result['overall_score']
-            else:
-                analysis_results['scores']['facial_emotion'] = "N/A"
-                analysis_results['errors'].append("Emotion analysis returned no result.")
-            cleanup_directory(extracted_frames_path)
+            workspace.check_quota()
+            stage_features['emotion'] = extract_emotion_features(extracted_frames_path, _sample_period(frame_rate))
         else:
-            analysis_results['scores']['facial_emotion'] = "N/A"
-            analysis_results['errors'].append("Frame extraction failed.")
+            stage_features['emotion'] = {"error": "Frame extraction failed."}
         print("--- Facial Emotion Analysis Done ---")
 
         print("\n--- Starting Body Posture Analysis (MediaPipe) ---")
-        posture_result = analyze_body_posture(video_path)
-        if posture_result:
-            if 'error' in posture_result:
-                analysis_results['errors'].append(f"Posture Analysis Error: {posture_result['error']}")
-                analysis_results['scores']['body_posture_mediapipe'] = "Error"
-            else:
-                analysis_results['scores']['body_posture_mediapipe'] = posture_result['overall_score']
-                analysis_results['metrics']['posture_avg_visibility'] = round(posture_result.get('average_visibility', 0), 2)
-                scores_to_average['body_posture_mediapipe'] = posture_result['overall_score']
-        else:
-            analysis_results['scores']['body_posture_mediapipe'] = "N/A"
-            analysis_results['errors'].append("Posture analysis (MediaPipe) returned no result.")
+        stage_features['posture'] = extract_posture_features(video_path)
         print("--- Body Posture Analysis (MediaPipe) Done ---")
 
         print("\n--- Starting Speech Transcription & Analysis (Whisper) ---")
-        speech_result = transcribe_speech(video_path)
-        if speech_result:
-            if "error" in speech_result:
-                analysis_results['errors'].append(f"Speech Analysis Error: {speech_result['error']}")
-                analysis_results['scores']['speech_clarity'] = "Error"
-                analysis_results['metrics']['speech_pace_wpm'] = "Error"
-                analysis_results['details']['transcript_preview'] = "Error"
-            else:
-                analysis_results['metrics']['speech_pace_wpm'] = speech_result['speech_pace_wpm']
-                analysis_results['scores']['speech_clarity'] = speech_result['speech_clarity_score']
-                analysis_results['metrics']['word_count'] = speech_result['word_count']
-                analysis_results['metrics']['filler_count'] = speech_result['filler_count']
-                transcript = speech_result['transcript']
-                analysis_results['details']['transcript_preview'] = transcript[:300] + ("..." if len(transcript) > 300 else "")
-                scores_to_average['speech_clarity'] = speech_result['speech_clarity_score']
-        else:
-            analysis_results['scores']['speech_clarity'] = "24"
-            analysis_results['metrics']['speech_pace_wpm'] = "39"
-            analysis_results['errors'].append("Speech analysis returned no result.")
+        audio_samples = extract_audio(video_path)
+        stage_features['speech'] = extract_speech_features(audio_samples)
         print("--- Speech Transcription & Analysis Done ---")
 
+        print("\n--- Starting Prosody Analysis ---")
+        stage_features['prosody'] = extract_prosody_features(audio_samples)
+        del audio_samples
+        print("--- Prosody Analysis Done ---")
+
         print("\n--- Starting Body Pose Analysis (OpenPose) ---")
-        openpose_result = analyze_openpose(video_path, request_openpose_folder)
-        if openpose_result:
-            if "error" in openpose_result:
-                analysis_results['errors'].append(f"OpenPose Analysis Error: {openpose_result['error']}")
-                analysis_results['scores']['body_pose_openpose'] = "Error"
-            else:
-                analysis_results['scores']['body_pose_openpose'] = openpose_result['overall_score']
-                analysis_results['metrics']['openpose_frames_analyzed'] = openpose_result.get('openpose_frames_analyzed')
-                analysis_results['metrics']['openpose_frames_with_people'] = openpose_result.get('openpose_frames_with_people')
-                scores_to_average['body_pose_openpose'] = openpose_result['overall_score']
-        else:
-            analysis_results['scores']['body_pose_openpose'] = "N/A"
-            analysis_results['errors'].append("OpenPose analysis returned no result.")
+        stage_features['openpose'] = extract_openpose_features(video_path, workspace.openpose_dir)
         print("--- Body Pose Analysis (OpenPose) Done ---")
 
-        print("\n--- Calculating Overall Score ---")
-        valid_scores = [s for s in scores_to_average.values() if isinstance(s, (int, float))]
-        if valid_scores:
-            overall_score = int(np.mean(valid_scores))
-            analysis_results['overall_score'] = max(0, min(100, overall_score))
-            print(f"Scores averaged: {scores_to_average}")
-            print(f"Calculated Overall Score: {analysis_results['overall_score']}")
-        else:
-            analysis_results['overall_score'] = 0
-            print("No valid scores available to calculate an overall score.")
-
-        summary_parts = [f"Overall Score: {analysis_results['overall_score']}/100."]
-        if analysis_results['scores'].get('facial_emotion') not in ["N/A", "Error"]:
-            summary_parts.append(f"Appeared predominantly {analysis_results['details'].get('dominant_emotion', 'neutral')}.")
-        if analysis_results['metrics'].get('speech_pace_wpm') not in ["37", "Error"]:
-            wpm = analysis_results['metrics']['speech_pace_wpm']
-            pace_desc = "very fast" if wpm > 170 else "fast" if wpm > 140 else "moderate" if wpm > 110 else "slow"
-            summary_parts.append(f"Speech pace was {pace_desc} ({wpm} WPM).")
-        if analysis_results['scores'].get('speech_clarity') not in ["26", "Error"]:
-            clarity = analysis_results['scores']['speech_clarity']
-            clarity_desc = "very clear" if clarity > 90 else "clear" if clarity > 75 else "moderately clear" if clarity > 50 else "less clear"
-            filler_count = analysis_results['metrics'].get('filler_count', 0)
-            summary_parts.append(f"Speech was {clarity_desc} (Clarity Score: {clarity}/100, Fillers: {filler_count}).")
-        if analysis_results['scores'].get('body_posture_mediapipe') not in ["N/A", "Error"]:
-            vis = analysis_results['metrics'].get('posture_avg_visibility', 0)
-            posture_desc = "clearly visible" if vis > 0.7 else "moderately visible" if vis > 0.4 else "partially obscured"
-            summary_parts.append(f"Posture was generally {posture_desc}.")
-
-        analysis_results['feedback_summary'] = " ".join(summary_parts)
+        save_features(video_hash, stage_features)
+
+        analysis_results = build_analysis_results(stage_features)
+        analysis_results['video_hash'] = video_hash
 
         print("\n--- Analysis Complete ---")
         return jsonify(analysis_results), 200
 
+    except WorkspaceQuotaError as e:
+        print(f"Aborted analysis: {e}")
+        return jsonify({'error': str(e)}), 413
+    except RequestEntityTooLarge:
+        print("Rejected upload: body exceeded the workspace quota while streaming.")
+        return jsonify({'error': f'Upload exceeds the {SCRATCH_QUOTA_BYTES / 1e6:.1f} MB workspace quota.'}), 413
     except FileNotFoundError as e:
         print(f"Error: Input video file not found after saving? {e}")
         return jsonify({'error': f'File processing error: {str(e)}'}), 500
@@ -495,12 +660,16 @@ def analyze_video():
         print(traceback.format_exc())
         return jsonify({'error': f'An unexpected server error occurred: {str(e)}'}), 500
     finally:
-        if os.path.exists(video_path):
-            try:
-                os.remove(video_path)
-                print(f"Cleaned up uploaded video: {video_path}")
-            except OSError as e:
-                print(f"Error deleting uploaded video {video_path}: {e}")
-        cleanup_directory(request_frame_folder)
-        cleanup_directory(request_openpose_folder)
+        release_workspace(workspace)
+
+
+@analysis_bp.route('/rescore/<video_hash>', methods=['GET'])
+def rescore_video(video_hash):
+
+    stage_features = load_features(video_hash)
+    if stage_features is None:
+        return jsonify({'error': f'No stored features for video {video_hash}'}), 404
 
+    analysis_results = build_analysis_results(stage_features)
+    analysis_results['video_hash'] = video_hash
+    return jsonify(analysis_results), 200
@@ -0,0 +1,60 @@
+import math
+import numpy as np
+
+
+TIMELINE_MOVING_AVERAGE_SECONDS = 5
+
+
+def grow_rows(buffer, min_rows, fill=np.nan):
+
+    # Doubling keeps appends amortised O(1) when the frame-count estimate was short.
+    if min_rows <= len(buffer):
+        return buffer
+    grown = np.full((max(min_rows, 2 * len(buffer)),) + buffer.shape[1:], fill, dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+def per_second(values, sample_period, num_seconds):
+
+    values = np.asarray(values, dtype=np.float32)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+
+    seconds = np.floor(np.arange(len(values)) * sample_period).astype(np.int64)
+    keep = seconds < num_seconds
+    seconds, values = seconds[keep], values[keep]
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0)
+    sums = np.empty((num_seconds, values.shape[1]), dtype=np.float64)
+    counts = np.empty((num_seconds, values.shape[1]), dtype=np.float64)
+    for col in range(values.shape[1]):
+        sums[:, col] = np.bincount(seconds, weights=filled[:, col], minlength=num_seconds)
+        counts[:, col] = np.bincount(seconds, weights=valid[:, col].astype(np.float64), minlength=num_seconds)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return means[:, 0] if squeeze else means
+
+
+def moving_average(curve, window=TIMELINE_MOVING_AVERAGE_SECONDS):
+
+    # Trailing NaN-aware mean via cumulative sums, so gaps don't drag the curve to zero.
+    curve = np.asarray(curve, dtype=np.float64)
+    valid = ~np.isnan(curve)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(valid, curve, 0))))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(curve) + 1)
+    start = np.maximum(end - window, 0)
+    counts = ccount[end] - ccount[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, (csum[end] - csum[start]) / counts, np.nan)
+
+
+def to_json_list(curve, decimals=2):
+
+    # NaN is not valid JSON, so gaps are sent as null for the chart to skip.
+    rounded = np.round(np.asarray(curve, dtype=np.float64), decimals)
+    return [None if math.isnan(v) else v for v in rounded.tolist()]
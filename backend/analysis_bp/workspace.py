@@ -0,0 +1,195 @@
+import os
+import time
+import uuid
+import queue
+import shutil
+import threading
+from werkzeug.utils import secure_filename
+
+
+# Scratch config. With SCRATCH_USE_TMPFS=1 jobs go to /dev/shm while it has room, falling back to SCRATCH_ROOT on disk.
+SCRATCH_ROOT = os.environ.get('SCRATCH_ROOT', 'uploads')
+SCRATCH_TMPFS_ROOT = os.environ.get('SCRATCH_TMPFS_ROOT', '/dev/shm/communication_assistant')
+SCRATCH_USE_TMPFS = os.environ.get('SCRATCH_USE_TMPFS', '0').lower() in ('1', 'true', 'yes')
+SCRATCH_QUOTA_BYTES = int(os.environ.get('SCRATCH_QUOTA_MB', 2048)) * 1024 * 1024
+SCRATCH_MIN_FREE_BYTES = int(os.environ.get('SCRATCH_MIN_FREE_MB', 512)) * 1024 * 1024
+SCRATCH_MAX_AGE_SECONDS = int(os.environ.get('SCRATCH_MAX_AGE_SECONDS', 2 * 60 * 60))
+JANITOR_INTERVAL_SECONDS = 60
+
+JOB_PREFIX = 'job_'
+TRASH_PREFIX = '.trash_'
+HEARTBEAT_FILE = '.heartbeat'
+
+
+class WorkspaceQuotaError(Exception):
+    pass
+
+
+class ScratchSpaceUnavailable(Exception):
+    pass
+
+
+class Workspace:
+
+    def __init__(self, path, quota_bytes=SCRATCH_QUOTA_BYTES):
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self.frames_dir = os.path.join(path, 'frames')
+        self.openpose_dir = os.path.join(path, 'openpose')
+        self.heartbeat_path = os.path.join(path, HEARTBEAT_FILE)
+
+    def touch(self):
+        # The owning process refreshes this while the job runs; other workers' janitors judge staleness by it.
+        with open(self.heartbeat_path, 'a'):
+            os.utime(self.heartbeat_path)
+
+    def upload_path(self, filename):
+        # Only the extension of the client's filename is kept; the job directory makes the name unique.
+        # Browser recordings arrive as e.g. "recorded_video.webm;codecs=vp8,opus", so drop the codec suffix.
+        ext = os.path.splitext(secure_filename((filename or '').split(';', 1)[0]))[1]
+        return os.path.join(self.path, f"upload{ext}")
+
+    def usage_bytes(self):
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    def check_quota(self, extra_bytes=0):
+        used = self.usage_bytes() + extra_bytes
+        if used > self.quota_bytes:
+            raise WorkspaceQuotaError(
+                f"Workspace quota exceeded: {used / 1e6:.1f} MB used, limit is {self.quota_bytes / 1e6:.1f} MB."
+            )
+
+
+_active_workspaces = {}
+_trash_queue = queue.Queue()
+_janitor_lock = threading.Lock()
+_janitor_thread = None
+
+
+def _scratch_root(expected_bytes):
+
+    needed = max(expected_bytes, 0) + SCRATCH_MIN_FREE_BYTES
+    candidates = [SCRATCH_TMPFS_ROOT, SCRATCH_ROOT] if SCRATCH_USE_TMPFS else [SCRATCH_ROOT]
+    for root in candidates:
+        try:
+            os.makedirs(root, exist_ok=True)
+            if shutil.disk_usage(root).free >= needed:
+                return root
+        except OSError as e:
+            print(f"Scratch root {root} unavailable: {e}")
+    raise ScratchSpaceUnavailable("Server is low on scratch space; please try again later.")
+
+
+def create_workspace(expected_bytes=0):
+
+    if expected_bytes > SCRATCH_QUOTA_BYTES:
+        raise WorkspaceQuotaError(
+            f"Upload of {expected_bytes / 1e6:.1f} MB exceeds the {SCRATCH_QUOTA_BYTES / 1e6:.1f} MB workspace quota."
+        )
+    start_janitor()
+
+    root = _scratch_root(expected_bytes)
+    workspace = Workspace(os.path.join(root, f"{JOB_PREFIX}{uuid.uuid4().hex}"))
+    os.makedirs(workspace.path)
+    workspace.touch()
+    with _janitor_lock:
+        _active_workspaces[workspace.path] = workspace
+    print(f"Created workspace: {workspace.path}")
+    return workspace
+
+
+def release_workspace(workspace):
+
+    # Renaming is a single metadata op; the actual rmtree happens on the janitor thread.
+    with _janitor_lock:
+        _active_workspaces.pop(workspace.path, None)
+    root, name = os.path.split(workspace.path)
+    trash_path = os.path.join(root, f"{TRASH_PREFIX}{name}")
+    try:
+        os.rename(workspace.path, trash_path)
+    except OSError:
+        trash_path = workspace.path
+    _trash_queue.put(trash_path)
+
+
+def _remove_tree(path):
+
+    if os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"Janitor removed: {path}")
+
+
+def _last_heartbeat(path):
+
+    try:
+        return os.stat(os.path.join(path, HEARTBEAT_FILE)).st_mtime
+    except OSError:
+        return os.stat(path).st_mtime
+
+
+def refresh_heartbeats():
+
+    with _janitor_lock:
+        workspaces = list(_active_workspaces.values())
+    for workspace in workspaces:
+        try:
+            workspace.touch()
+        except OSError as e:
+            print(f"Could not refresh heartbeat for {workspace.path}: {e}")
+
+
+def sweep_stale_workspaces(max_age_seconds=SCRATCH_MAX_AGE_SECONDS):
+
+    roots = [SCRATCH_TMPFS_ROOT, SCRATCH_ROOT] if SCRATCH_USE_TMPFS else [SCRATCH_ROOT]
+    now = time.time()
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                if entry.name.startswith(TRASH_PREFIX):
+                    _remove_tree(entry.path)
+                elif entry.name.startswith(JOB_PREFIX):
+                    with _janitor_lock:
+                        active = entry.path in _active_workspaces
+                    if not active and now - _last_heartbeat(entry.path) > max_age_seconds:
+                        _remove_tree(entry.path)
+            except OSError as e:
+                print(f"Janitor could not inspect {entry.path}: {e}")
+
+
+def _janitor_loop():
+
+    next_sweep = 0
+    while True:
+        try:
+            _remove_tree(_trash_queue.get(timeout=JANITOR_INTERVAL_SECONDS))
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"Janitor error: {e}")
+        if time.monotonic() >= next_sweep:
+            refresh_heartbeats()
+            try:
+                sweep_stale_workspaces()
+            except OSError as e:
+                print(f"Janitor sweep failed: {e}")
+            next_sweep = time.monotonic() + JANITOR_INTERVAL_SECONDS
+
+
+def start_janitor():
+
+    global _janitor_thread
+    with _janitor_lock:
+        if _janitor_thread is None or not _janitor_thread.is_alive():
+            _janitor_thread = threading.Thread(target=_janitor_loop, name='scratch-janitor', daemon=True)
+            _janitor_thread.start()
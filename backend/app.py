@@ -1,17 +1,16 @@
-import os
 from flask import Flask
 from flask_cors import CORS
 from analysis_bp.routes import analysis_bp
+from analysis_bp.workspace import SCRATCH_ROOT, SCRATCH_QUOTA_BYTES
 from auth_bp.routes import auth_bp
 from models import db
 
 app = Flask(__name__)
 CORS(app) 
 
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['UPLOAD_FOLDER'] = SCRATCH_ROOT
+# Werkzeug stops reading an upload past this and answers 413, with or without a Content-Length.
+app.config['MAX_CONTENT_LENGTH'] = SCRATCH_QUOTA_BYTES
 app.config['SECRET_KEY'] = '9ksjjfjheufyydonf8redsso8erlfwoi' 
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db' 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app is run from backend/, so its packages are imported relative to it.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pytest
+
+from analysis_bp import feature_store
+from analysis_bp.feature_store import STAGES, save_features, load_features
+
+
+VIDEO_HASH = 'a' * 64
+
+
+@pytest.fixture(autouse=True)
+def store_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(feature_store, 'FEATURE_STORE_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def test_features_round_trip():
+    keypoints = np.zeros((300, 2, 25, 3), dtype=np.float32)
+    keypoints[:, 0, 1] = [320.5, 136.25, 0.85]
+    stage_features = {
+        'openpose': {'keypoints': keypoints},
+        'speech': {'error': 'No speech detected.'},
+    }
+
+    assert save_features(VIDEO_HASH, stage_features)
+    loaded = load_features(VIDEO_HASH)
+
+    assert set(loaded) == set(STAGES)
+    np.testing.assert_array_equal(loaded['openpose']['keypoints'], keypoints)
+    assert loaded['openpose']['keypoints'].dtype == np.float32
+    assert loaded['speech'] == {'error': 'No speech detected.'}
+    assert loaded['emotion'] is None
+
+
+def test_sparse_keypoints_are_stored_compressed(store_folder):
+    keypoints = np.zeros((3600, 2, 25, 3), dtype=np.float32)
+    keypoints[:, 0, 1] = [320.5, 136.25, 0.85]
+
+    save_features(VIDEO_HASH, {'openpose': {'keypoints': keypoints}})
+
+    assert os.path.getsize(store_folder / f"{VIDEO_HASH}.npz") < keypoints.nbytes / 10
+    assert not [f for f in os.listdir(store_folder) if f.endswith('.tmp')]
@@ -0,0 +1,131 @@
+import os
+import numpy as np
+import pytest
+
+from analysis_bp import pose_backend
+from analysis_bp.pose_backend import BODY_25_KEYPOINTS, NECK, run_pose_backend, score_openpose, _order_people
+
+
+STUB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tools', 'openpose_stub.py'))
+STUB_FRAMES = 50
+
+
+@pytest.fixture
+def stub_openpose(monkeypatch, tmp_path):
+    monkeypatch.setattr(pose_backend, 'POSE_BACKEND', 'openpose')
+    monkeypatch.setattr(pose_backend, 'OPENPOSE_BIN_PATH', STUB_PATH)
+    monkeypatch.setenv('OPENPOSE_STUB_FRAMES', str(STUB_FRAMES))
+    video_path = tmp_path / 'video.webm'
+    video_path.write_bytes(b'not a real video')
+    output_dir = tmp_path / 'openpose'
+    output_dir.mkdir()
+    return str(video_path), str(output_dir)
+
+
+def test_stub_keypoints_are_ingested_into_array(stub_openpose):
+    features = run_pose_backend(*stub_openpose)
+
+    keypoints = features['keypoints']
+    assert keypoints.shape == (STUB_FRAMES, pose_backend.POSE_MAX_PEOPLE, BODY_25_KEYPOINTS, 3)
+    assert keypoints.dtype == np.float32
+
+    empty = np.arange(STUB_FRAMES) % 10 == 9
+    assert (keypoints[empty] == 0).all()
+    assert (keypoints[~empty, 0, NECK, 2] > 0).all()
+    # Every ingested JSON file is removed once it has been parsed.
+    assert not [f for f in os.listdir(stub_openpose[1]) if f.endswith('.json')]
+
+
+def test_stub_output_scores(stub_openpose):
+    result = score_openpose(run_pose_backend(*stub_openpose))
+
+    assert result['openpose_frames_analyzed'] == STUB_FRAMES
+    assert result['openpose_frames_with_people'] == 45
+    assert result['overall_score'] == 90
+    assert result['openpose_keypoint_confidence'] == pytest.approx(0.85)
+    assert result['openpose_torso_lean_deg'] == pytest.approx(0.0)
+    assert 0 < result['openpose_shoulder_tilt_deg'] < 5
+    assert 0 < result['openpose_hand_movement'] < 0.1
+
+
+def test_missing_binary_is_reported(monkeypatch, tmp_path):
+    monkeypatch.setattr(pose_backend, 'OPENPOSE_BIN_PATH', str(tmp_path / 'missing'))
+    assert 'error' in run_pose_backend(str(tmp_path / 'video.webm'), str(tmp_path))
+
+
+def _person(neck_x, confidence):
+    person = np.zeros((BODY_25_KEYPOINTS, 3), dtype=np.float32)
+    person[NECK] = [neck_x, 100, confidence]
+    return person
+
+
+def test_speaker_is_tracked_by_previous_neck():
+    near, confident = _person(100, 0.5), _person(500, 0.9)
+
+    assert _order_people([near, confident], None)[0] is confident
+    assert _order_people([confident, near], np.array([110, 100]))[0] is near
+
+
+def test_hand_movement_skips_frames_where_speaker_changes():
+    from analysis_bp.pose_backend import R_SHOULDER, L_SHOULDER, R_WRIST, pose_metrics
+
+    keypoints = np.zeros((2, 1, BODY_25_KEYPOINTS, 3), dtype=np.float32)
+    for frame, offset in enumerate((0, 400)):
+        keypoints[frame, 0, NECK] = [100 + offset, 100, 0.9]
+        keypoints[frame, 0, R_SHOULDER] = [50 + offset, 100, 0.9]
+        keypoints[frame, 0, L_SHOULDER] = [150 + offset, 100, 0.9]
+        keypoints[frame, 0, R_WRIST] = [50 + offset, 250, 0.9]
+
+    assert pose_metrics(keypoints)['hand_movement'] is None
+
+
+@pytest.fixture
+def hanging_openpose(monkeypatch, tmp_path):
+    # Writes two keypoint files, then never exits.
+    script = tmp_path / 'hanging_openpose.py'
+    script.write_text(
+        "#!/usr/bin/env python3\n"
+        "import sys, time, json, os\n"
+        "out = sys.argv[sys.argv.index('--write_json') + 1]\n"
+        "for i in range(2):\n"
+        "    with open(os.path.join(out, f'video_{i:012d}_keypoints.json'), 'w') as f:\n"
+        "        json.dump({'people': []}, f)\n"
+        "time.sleep(60)\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setattr(pose_backend, 'OPENPOSE_BIN_PATH', str(script))
+
+    processes = []
+    popen = pose_backend.subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        processes.append(popen(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(pose_backend.subprocess, 'Popen', recording_popen)
+    output_dir = tmp_path / 'openpose'
+    output_dir.mkdir()
+    return str(tmp_path / 'video.webm'), str(output_dir), processes
+
+
+def test_hung_openpose_is_killed_after_timeout(hanging_openpose, monkeypatch):
+    video_path, output_dir, processes = hanging_openpose
+    monkeypatch.setattr(pose_backend, 'POSE_TIMEOUT_SECONDS', 1)
+
+    features = run_pose_backend(video_path, output_dir)
+
+    assert 'did not finish' in features['error']
+    assert processes[0].poll() is not None
+
+
+def test_openpose_is_killed_when_ingestion_fails(hanging_openpose, monkeypatch):
+    video_path, output_dir, processes = hanging_openpose
+
+    def bogus_frame_index(buffer, min_rows, fill=np.nan):
+        raise MemoryError
+
+    monkeypatch.setattr(pose_backend, 'grow_rows', bogus_frame_index)
+
+    with pytest.raises(MemoryError):
+        run_pose_backend(video_path, output_dir)
+    assert processes[0].poll() is not None
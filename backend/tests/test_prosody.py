@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from analysis_bp.prosody import (
+    SAMPLE_RATE, HOP_LENGTH, frame_energy_db, pitch_contour, voiced_mask, pause_durations
+)
+
+
+HOP_SECONDS = HOP_LENGTH / SAMPLE_RATE
+
+
+def _tone(freq_hz, seconds, amplitude=0.3):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq_hz * t)).astype(np.float32)
+
+
+def _silence(seconds, rng):
+    return (0.001 * rng.standard_normal(int(SAMPLE_RATE * seconds))).astype(np.float32)
+
+
+@pytest.mark.parametrize("freq_hz", [90, 150, 220, 350])
+def test_pitch_contour_tracks_tone(freq_hz):
+    pitch = pitch_contour(_tone(freq_hz, 1.0))
+    assert np.nanmedian(pitch) == pytest.approx(freq_hz, rel=0.03)
+    assert np.isfinite(pitch).mean() > 0.9
+
+
+def test_pitch_contour_leaves_noise_unvoiced():
+    noise = np.random.default_rng(0).standard_normal(SAMPLE_RATE).astype(np.float32)
+    assert np.isfinite(pitch_contour(noise)).mean() < 0.1
+
+
+def test_pitch_contour_short_input():
+    assert len(pitch_contour(np.zeros(10, dtype=np.float32))) == 0
+
+
+def test_voiced_mask_and_pauses_on_gapped_tone():
+    rng = np.random.default_rng(0)
+    samples = np.concatenate([_tone(150, 1.0), _silence(0.5, rng), _tone(200, 1.0), _silence(1.0, rng), _tone(120, 1.0)])
+    voiced = voiced_mask(frame_energy_db(samples))
+
+    pauses = pause_durations(voiced, HOP_SECONDS)
+    assert len(pauses) == 2
+    assert pauses[0] == pytest.approx(0.5, abs=0.06)
+    assert pauses[1] == pytest.approx(1.0, abs=0.06)
+
+
+def test_voiced_mask_continuous_tone_has_no_pauses():
+    voiced = voiced_mask(frame_energy_db(_tone(150, 10.0)))
+    assert voiced.all()
+    assert len(pause_durations(voiced, HOP_SECONDS)) == 0
+
+
+def test_voiced_mask_without_contrast():
+    rng = np.random.default_rng(0)
+    noise = (0.3 * rng.standard_normal(SAMPLE_RATE * 10)).astype(np.float32)
+    assert voiced_mask(frame_energy_db(noise)).all()
+    assert not voiced_mask(frame_energy_db(_silence(10.0, rng))).any()
+
+
+def test_pause_durations_ignores_edges_and_short_gaps():
+    voiced = np.array([0] * 50 + [1] * 20 + [0] * 10 + [1] * 20 + [0] * 40 + [1] * 5 + [0] * 80, dtype=bool)
+    pauses = pause_durations(voiced, HOP_SECONDS)
+    np.testing.assert_allclose(pauses, [0.4], atol=1e-6)
+
+
+def test_pause_durations_needs_two_voiced_frames():
+    assert len(pause_durations(np.array([0, 1, 0], dtype=bool), HOP_SECONDS)) == 0
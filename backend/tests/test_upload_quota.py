@@ -0,0 +1,68 @@
+import io
+import os
+import pytest
+
+pytest.importorskip('flask')
+routes = pytest.importorskip('analysis_bp.routes')
+
+from flask import Flask
+from analysis_bp import workspace
+
+
+QUOTA_BYTES = 64 * 1024
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(workspace, 'SCRATCH_ROOT', str(tmp_path))
+    monkeypatch.setattr(workspace, 'SCRATCH_USE_TMPFS', False)
+    monkeypatch.setattr(workspace, 'SCRATCH_QUOTA_BYTES', QUOTA_BYTES)
+    monkeypatch.setattr(workspace, 'SCRATCH_MIN_FREE_BYTES', 0)
+    monkeypatch.setattr(workspace, 'start_janitor', lambda: None)
+    monkeypatch.setattr(routes, 'start_janitor', lambda: None)
+
+    # Configured the way app.py configures the real app.
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = QUOTA_BYTES
+    app.register_blueprint(routes.analysis_bp)
+    return app.test_client()
+
+
+def _multipart_body(size):
+    boundary = 'quotatestboundary'
+    body = (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="video"; filename="recorded_video.webm"\r\n'
+        'Content-Type: video/webm\r\n\r\n'
+    ).encode() + b'\0' * size + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def _job_dirs(tmp_path):
+    return [name for name in os.listdir(tmp_path) if name.startswith(workspace.JOB_PREFIX)]
+
+
+def test_over_quota_upload_with_content_length_is_rejected(client, tmp_path):
+    body, content_type = _multipart_body(2 * QUOTA_BYTES)
+
+    response = client.post('/api/analyze', data=body, content_type=content_type)
+
+    assert response.status_code == 413
+    assert 'quota' in response.get_json()['error']
+    assert not _job_dirs(tmp_path)
+
+
+def test_over_quota_upload_without_content_length_is_rejected(client, tmp_path):
+    body, content_type = _multipart_body(2 * QUOTA_BYTES)
+
+    response = client.post(
+        '/api/analyze',
+        input_stream=io.BytesIO(body),
+        content_type=content_type,
+        headers={'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True},
+    )
+
+    assert response.status_code == 413
+    assert 'quota' in response.get_json()['error']
+    assert not _job_dirs(tmp_path)
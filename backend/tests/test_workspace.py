@@ -0,0 +1,91 @@
+import os
+import time
+import pytest
+
+from analysis_bp import workspace
+from analysis_bp.workspace import (
+    HEARTBEAT_FILE, JOB_PREFIX, TRASH_PREFIX, ScratchSpaceUnavailable, WorkspaceQuotaError,
+    create_workspace, release_workspace, sweep_stale_workspaces,
+)
+
+
+MAX_AGE_SECONDS = 60
+
+
+@pytest.fixture(autouse=True)
+def scratch_root(monkeypatch, tmp_path):
+    monkeypatch.setattr(workspace, 'SCRATCH_ROOT', str(tmp_path))
+    monkeypatch.setattr(workspace, 'SCRATCH_USE_TMPFS', False)
+    monkeypatch.setattr(workspace, 'SCRATCH_MIN_FREE_BYTES', 0)
+    monkeypatch.setattr(workspace, 'start_janitor', lambda: None)
+    monkeypatch.setattr(workspace, '_active_workspaces', {})
+    return tmp_path
+
+
+def _age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_upload_over_quota_raises_quota_error(scratch_root):
+    with pytest.raises(WorkspaceQuotaError):
+        create_workspace(workspace.SCRATCH_QUOTA_BYTES + 1)
+    assert not os.listdir(scratch_root)
+
+
+def test_low_disk_raises_scratch_unavailable(monkeypatch, scratch_root):
+    monkeypatch.setattr(workspace, 'SCRATCH_MIN_FREE_BYTES', 1 << 60)
+    with pytest.raises(ScratchSpaceUnavailable):
+        create_workspace(1024)
+    assert not os.listdir(scratch_root)
+
+
+def test_workspace_quota_counts_written_files():
+    job = create_workspace()
+    job.quota_bytes = 1000
+    with open(job.upload_path('recorded_video.webm;codecs=vp8,opus'), 'wb') as f:
+        f.write(b'\0' * 2000)
+
+    assert job.upload_path('recorded_video.webm;codecs=vp8,opus').endswith('upload.webm')
+    with pytest.raises(WorkspaceQuotaError):
+        job.check_quota()
+
+
+def test_release_renames_workspace_to_trash(scratch_root):
+    job = create_workspace()
+    name = os.path.basename(job.path)
+
+    release_workspace(job)
+
+    assert not os.path.exists(job.path)
+    assert os.listdir(scratch_root) == [f"{TRASH_PREFIX}{name}"]
+    assert job.path not in workspace._active_workspaces
+
+
+def test_sweep_removes_only_stale_workspaces(scratch_root):
+    active = create_workspace()
+    _age(active.heartbeat_path, 10 * MAX_AGE_SECONDS)
+
+    fresh = scratch_root / f"{JOB_PREFIX}fresh"
+    fresh.mkdir()
+    (fresh / HEARTBEAT_FILE).touch()
+    _age(fresh, 10 * MAX_AGE_SECONDS)
+
+    stale = scratch_root / f"{JOB_PREFIX}stale"
+    stale.mkdir()
+    (stale / HEARTBEAT_FILE).touch()
+    _age(stale / HEARTBEAT_FILE, 10 * MAX_AGE_SECONDS)
+
+    orphan = scratch_root / f"{JOB_PREFIX}orphan"
+    orphan.mkdir()
+    _age(orphan, 10 * MAX_AGE_SECONDS)
+
+    trash = scratch_root / f"{TRASH_PREFIX}{JOB_PREFIX}released"
+    trash.mkdir()
+    unrelated = scratch_root / 'unrelated'
+    unrelated.mkdir()
+    _age(unrelated, 10 * MAX_AGE_SECONDS)
+
+    sweep_stale_workspaces(MAX_AGE_SECONDS)
+
+    assert sorted(os.listdir(scratch_root)) == sorted([os.path.basename(active.path), fresh.name, unrelated.name])
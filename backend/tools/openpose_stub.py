@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Stand-in for OpenPoseDemo that writes synthetic BODY_25 keypoint JSON.
+
+Accepts the same flags analyze_openpose passes to the real binary, so it can be
+used for local runs and benchmarks on machines without OpenPose:
+
+    OPENPOSE_BIN_PATH=tools/openpose_stub.py python app.py
+
+The frame count comes from the video via OpenCV when available, otherwise from
+OPENPOSE_STUB_FRAMES (default 300). Every 10th frame has nobody in it.
+"""
+import os
+import sys
+import json
+import math
+import argparse
+
+
+BODY_25_KEYPOINTS = 25
+
+
+def count_frames(video_path):
+    try:
+        import cv2
+    except ImportError:
+        return None
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return frames if frames > 0 else None
+
+
+def synthetic_person(frame_idx, width=640, height=480):
+    # Upright figure whose wrists swing slowly, roughly in BODY_25 layout.
+    cx, top = width / 2, height * 0.2
+    swing = 20 * math.sin(frame_idx / 15.0)
+    points = {
+        0: (cx, top), 1: (cx, top + 40),
+        2: (cx - 50, top + 42), 3: (cx - 60, top + 100), 4: (cx - 55 + swing, top + 150),
+        5: (cx + 50, top + 40), 6: (cx + 60, top + 100), 7: (cx + 55 - swing, top + 150),
+        8: (cx, top + 180),
+    }
+    keypoints = []
+    for idx in range(BODY_25_KEYPOINTS):
+        x, y = points.get(idx, (0.0, 0.0))
+        keypoints.extend([round(x, 3), round(y, 3), 0.85 if idx in points else 0.0])
+    return {
+        "person_id": [-1],
+        "pose_keypoints_2d": keypoints,
+        "face_keypoints_2d": [],
+        "hand_left_keypoints_2d": [],
+        "hand_right_keypoints_2d": [],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--write_json", required=True)
+    args, _ = parser.parse_known_args(argv)
+
+    if not os.path.exists(args.video):
+        print(f"Error: video not found: {args.video}", file=sys.stderr)
+        return 1
+
+    num_frames = count_frames(args.video) or int(os.environ.get("OPENPOSE_STUB_FRAMES", 300))
+    os.makedirs(args.write_json, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.video))[0]
+
+    for frame_idx in range(num_frames):
+        people = [] if frame_idx % 10 == 9 else [synthetic_person(frame_idx)]
+        path = os.path.join(args.write_json, f"{stem}_{frame_idx:012d}_keypoints.json")
+        with open(path, "w") as f:
+            json.dump({"version": 1.3, "people": people}, f)
+
+    print(f"OpenPose stub wrote {num_frames} frames to {args.write_json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())